@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+from pathlib import Path
+import sys
+import time
+
+import uharfbuzz as hb
+
+from pipeline import BUILD_DIR, CONFIG_PATH, FIRA_CODE_FONT, FONT_VERSION, HANGUL_CODEPOINTS
+from variants import load_variants, select_variants
+
+ROOT_DIR = Path(os.path.dirname(os.path.realpath(__file__)))
+BASELINE_PATH = ROOT_DIR / "golden" / "shaping.json"
+OUTPUT_DIR = BUILD_DIR / "bench"
+HANGUL = set(HANGUL_CODEPOINTS)
+
+ROUNDS = 5
+REPEAT = 20
+# The benchmark fails once the throughput of the built font relative to Fira Code drops by more than this
+THROUGHPUT_TOLERANCE = 0.1
+
+# Sequences touched by the GSUB patches of the build
+samples = [
+    "&&", "&&&", "a && b", "a&b",
+    "~@", "x~@y", "~~@", "@", "user@example.com",
+    "<=", ">=", "<==", ">==", "a <= b >= c", "<=>", "=<", "=>",
+    "->", "=>", "==", "===", "!=", "!==", "++", "--", "__",
+    "g", "gĝğġģ", "r", "error",
+    "가나다라마바사", "다람쥐 헌 쳇바퀴에 타고파", "다A람B쥐C헌D쳇E바", "if (값 <= 10 && 이름 != \"\") {",
+]
+
+corpus = {
+    "python": """
+def find_substitution(self, lookup_index, backtrack, input, lookahead):
+    key = (lookup_index, tuple(backtrack), tuple(input), tuple(lookahead))
+    if key not in self.cache:
+        self.cache[key] = self._find_substitution(lookup_index, backtrack, input, lookahead)
+    return self.cache[key]
+
+for glyph_id, glyph, variation in zip(glyph_ids, glyphs, variations):
+    if glyph.numberOfContours <= 0 or not variation:
+        continue
+    result = [v for v in variation if v is not None and v.axes != {}]
+print(f"{size_before} -> {size_after} bytes ({saved / max(size_before, 1):.1%})")
+lambda x: x ** 2 >= 0 and x != None or x == [] or x <= -1
+""",
+    "javascript": """
+const shard = (codepoints, size = 1000) => codepoints.length <= size ? [codepoints] : [codepoints.slice(0, size), ...shard(codepoints.slice(size), size)];
+if (a === b && c !== d || e >= f) { return a?.b ?? c; }
+export async function load(url) { const res = await fetch(url); return res.ok && (await res.json()); }
+let x = y >>> 2; x <<= 1; x **= 3; x ||= 4; x &&= 5; x ??= 6;
+// TODO: remove ~@ after the release
+""",
+    "rust": """
+fn scale(points: &mut [(i32, i32)], factor: f64) -> Result<(), Error> {
+    for (x, y) in points.iter_mut() { *x = (*x as f64 * factor).round() as i32; *y = (*y as f64 * factor).round() as i32; }
+    Ok(())
+}
+impl<'a> Iterator for Glyphs<'a> { type Item = &'a Glyph; fn next(&mut self) -> Option<Self::Item> { self.inner.next() } }
+let deltas: Vec<_> = tuples.iter().filter(|t| t.peak != 0.0 && t.start <= t.end).collect::<Vec<_>>();
+""",
+    "haskell": """
+main :: IO ()
+main = mapM_ print . filter (\\x -> x >= 0 && x /= 3) $ [1..10] >>= \\n -> [n, n * 2]
+compose f g = f . g <$> xs <*> ys >>= pure <=< traverse id
+data Tree a = Leaf | Node (Tree a) a (Tree a) deriving (Eq, Ord, Show)
+""",
+    "c": """
+static int compare(const void *a, const void *b) { return *(const int *)a - *(const int *)b; }
+for (size_t i = 0; i < count && glyphs[i] != NULL; ++i) { if (glyphs[i]->xMin <= x_min) x_min = glyphs[i]->xMin; }
+#define MAX(a, b) ((a) >= (b) ? (a) : (b))
+ptr->next->prev = ptr->prev; flags |= 1 << 20; mask &= ~0x3F; value >>= 2;
+""",
+    "go": """
+func (f *Font) Glyph(name string) (*Glyph, error) { if g, ok := f.glyphs[name]; ok { return g, nil }; return nil, ErrNotFound }
+for i := 0; i <= len(xs)-1; i++ { if xs[i] != nil && xs[i].Width >= 0 { total += xs[i].Width } }
+ch := make(chan int, 10); go func() { ch <- 1 }(); v := <-ch
+""",
+    "shell": """
+#!/usr/bin/env bash
+set -euo pipefail
+[[ -f build/PreFiraCode-VF.ttf ]] && echo "ok" || { echo "missing" >&2; exit 1; }
+for f in build/*.woff2; do du -h "$f" | awk '{ print $1 }'; done 2>/dev/null | sort -h
+git log --oneline -n 10 | grep -E '^[0-9a-f]{7} \\[' >> ~/changes.txt
+""",
+    "korean": """
+# 한글 글리프를 Fira Code 크기에 맞게 변환한다
+hangul_width = 2  # 한글 글자의 너비는 영문 글자의 두 배
+print("다람쥐 헌 쳇바퀴에 타고파: ", count >= 10 && ok)
+// 사용자 입력이 비어 있으면 기본값을 사용합니다 -> default
+오류가 발생했습니다: file not found (경로 = ~/fonts/PreFiraCode-VF.ttf)
+SELECT 이름, 나이 FROM 사용자 WHERE 나이 >= 20 AND 이름 <> '' ORDER BY 나이 DESC;
+""",
+}
+
+def corpus_lines(paths):
+    lines = [("samples", sample) for sample in samples]
+    for language, text in corpus.items():
+        lines.extend((language, line) for line in text.splitlines() if line.strip())
+    for path in paths:
+        lines.extend((path.name, line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip())
+    return lines
+
+def load_font(path):
+    return hb.Font(hb.Face(hb.Blob.from_file_path(path)))
+
+def shape(font, text, features):
+    buf = hb.Buffer()
+    buf.add_codepoints([ord(c) for c in text])
+    buf.guess_segment_properties()
+    hb.shape(font, buf, features)
+    return buf
+
+def glyph_names(font, text, features):
+    buf = shape(font, text, features)
+    names = []
+    for info in buf.glyph_infos:
+        name = font.glyph_to_string(info.codepoint)
+        codepoint = ord(text[info.cluster])
+        if name == ".notdef" and codepoint in HANGUL:
+            # Fira Code has no hangul, compare with the glyph the build inserts instead
+            name = f"uni{codepoint:X}"
+        names.append(name)
+    return names
+
+def throughput(font, lines, features, rounds=ROUNDS, repeat=REPEAT):
+    codepoints = [[ord(c) for c in line] for _, line in lines]
+    best = None
+    for _ in range(rounds):
+        glyph_count = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for line in codepoints:
+                buf = hb.Buffer()
+                buf.add_codepoints(line)
+                buf.guess_segment_properties()
+                hb.shape(font, buf, features)
+                glyph_count += len(buf.glyph_infos)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return glyph_count / best
+
+def lookup_hits(font, lines, features):
+    hits = {}
+    state = {}
+    for _, line in lines:
+        buf = hb.Buffer()
+        buf.add_codepoints([ord(c) for c in line])
+        buf.guess_segment_properties()
+
+        def snapshot():
+            # GSUB changes glyphs and GPOS changes positions, which do not exist yet while substituting
+            if state["table"] == "GPOS":
+                return [(p.x_advance, p.y_advance, p.x_offset, p.y_offset) for p in buf.glyph_positions]
+            return [info.codepoint for info in buf.glyph_infos]
+
+        def on_message(message):
+            words = message.split()
+            if words[:2] == ["start", "table"]:
+                state["table"] = words[2]
+            elif words[:2] == ["start", "lookup"]:
+                state["before"] = snapshot()
+                state["skipped"] = False
+            elif words[:2] == ["skipped", "lookup"]:
+                state["skipped"] = True
+            elif words[:2] == ["end", "lookup"]:
+                lookup = f"{state['table']} {words[2]} {words[4].strip(chr(39))}"
+                entry = hits.setdefault(lookup, {"applied": 0, "hits": 0})
+                if not state["skipped"]:
+                    entry["applied"] += 1
+                    entry["hits"] += snapshot() != state["before"]
+            return True
+
+        buf.set_message_func(on_message)
+        hb.shape(font, buf, features)
+    return dict(sorted(hits.items(), key=lambda item: (item[0].split()[0], int(item[0].split()[1]))))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="TOML file listing the font variants")
+    parser.add_argument("--variant", help="name of the variant to benchmark, defaults to the first one")
+    parser.add_argument("--corpus", type=Path, nargs="*", default=[], help="additional text files to shape")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="number of timed rounds, the fastest one is used")
+    parser.add_argument("--update", action="store_true", help="accept the current throughput and glyph differences as the baseline")
+    args = parser.parse_args()
+
+    variant = select_variants(load_variants(args.config, FONT_VERSION), [args.variant] if args.variant else None)[0]
+    built_path = BUILD_DIR / f"{variant['name']}-VF.ttf"
+    original = load_font(FIRA_CODE_FONT)
+    built = load_font(built_path)
+    # The build turns these features on by default, so shape Fira Code with them for the same output
+    original_features = {feature: True for feature in variant["features"]}
+    lines = corpus_lines(args.corpus)
+
+    original_speed = throughput(original, lines, original_features, args.rounds)
+    built_speed = throughput(built, lines, {}, args.rounds)
+    ratio = built_speed / original_speed
+    print(f"Fira Code: {original_speed:,.0f} glyphs/s, {built_path.name}: {built_speed:,.0f} glyphs/s ({ratio:.1%})")
+
+    differences = {}
+    for language, line in lines:
+        built_names = glyph_names(built, line, {})
+        original_names = glyph_names(original, line, original_features)
+        if built_names != original_names:
+            differences[line] = {"language": language, "built": built_names, "original": original_names}
+
+    baseline = None
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    failures = []
+    if baseline is None:
+        failures.append(f"missing baseline {BASELINE_PATH.relative_to(ROOT_DIR)}")
+    else:
+        minimum = baseline["throughput_ratio"] * (1 - THROUGHPUT_TOLERANCE)
+        if ratio < minimum:
+            failures.append(f"throughput dropped to {ratio:.1%} of Fira Code, the baseline is {baseline['throughput_ratio']:.1%}")
+        for line, difference in differences.items():
+            accepted = baseline["differences"].get(line)
+            if accepted is None or accepted["built"] != difference["built"]:
+                failures.append(f"unexpected glyphs for {line!r}: {' '.join(difference['built'])}, Fira Code gives {' '.join(difference['original'])}")
+        for line in baseline["differences"]:
+            if line not in differences and any(line == text for _, text in lines):
+                print(f"No longer differs from Fira Code: {line!r}")
+
+    print(f"{len(differences)} of {len(lines)} lines shape differently from Fira Code with {', '.join(variant['features'])}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+
+    report = {
+        "variant": variant["name"],
+        "lines": len(lines),
+        "throughput": {"original": original_speed, "built": built_speed, "ratio": ratio},
+        "lookups": {"original": lookup_hits(original, lines, original_features), "built": lookup_hits(built, lines, {})},
+        "differences": differences,
+        "failures": failures,
+    }
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(OUTPUT_DIR / "report.json", "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.update:
+        os.makedirs(BASELINE_PATH.parent, exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"throughput_ratio": ratio, "differences": differences}, f, indent=2, ensure_ascii=False)
+        print(f"Updated {BASELINE_PATH.relative_to(ROOT_DIR)}")
+    elif failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import os
+
+from fontTools.ttLib.tables._g_l_y_f import Glyph
+from fontTools.ttLib.tables.TupleVariation import TupleVariation
+import numpy as np
+
+# Bump when the stored layout or the transform itself changes
+CACHE_FORMAT = 3
+CACHE_SIZE_LIMIT = 512 * 1024 * 1024
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(paths, **params):
+    digest = hashlib.sha256(f"format={CACHE_FORMAT}".encode())
+    for path in paths:
+        digest.update(file_digest(path).encode())
+    for name in sorted(params):
+        digest.update(f"{name}={params[name]!r}".encode())
+    return digest.hexdigest()
+
+def _entry_path(cache_dir, key):
+    return cache_dir / f"{key}.npz"
+
+def store_glyphs(cache_dir, key, glyf_table, glyph_ids, glyphs, variations):
+    glyph_data = [glyph.compile(glyf_table) for glyph in glyphs]
+    axis_tags = sorted({tag for variation in variations for v in variation for tag in v.axes})
+    tuples = [v for variation in variations for v in variation]
+    axes = np.full((len(tuples), len(axis_tags), 3), np.nan)
+    for i, v in enumerate(tuples):
+        for j, tag in enumerate(axis_tags):
+            if tag in v.axes:
+                axes[i, j] = v.axes[tag]
+    mask = np.array([coordinate is not None for v in tuples for coordinate in v.coordinates], dtype=bool)
+    deltas = np.array([coordinate for v in tuples for coordinate in v.coordinates if coordinate is not None], dtype=np.int32).reshape(-1, 2)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+    with open(path.with_suffix(".tmp"), "wb") as f:
+        np.savez_compressed(
+            f,
+            glyph_ids=np.array(glyph_ids, dtype=str),
+            glyf_data=np.frombuffer(b"".join(glyph_data), dtype=np.uint8),
+            glyf_lengths=np.array([len(data) for data in glyph_data], dtype=np.int64),
+            axis_tags=np.array(axis_tags, dtype=str),
+            tuple_counts=np.array([len(variation) for variation in variations], dtype=np.int64),
+            tuple_axes=axes,
+            point_counts=np.array([len(v.coordinates) for v in tuples], dtype=np.int64),
+            delta_mask=mask,
+            deltas=deltas,
+        )
+    os.replace(path.with_suffix(".tmp"), path)
+    evict(cache_dir)
+
+def load_glyphs(cache_dir, key):
+    path = _entry_path(cache_dir, key)
+    if not path.exists():
+        return None
+    # Mark the entry as recently used for eviction
+    os.utime(path)
+
+    with np.load(path) as entry:
+        glyph_ids = entry["glyph_ids"].tolist()
+        glyf_data = entry["glyf_data"].tobytes()
+        glyf_offsets = np.concatenate(([0], np.cumsum(entry["glyf_lengths"])))
+        glyphs = [Glyph(glyf_data[start:end]) for start, end in zip(glyf_offsets[:-1], glyf_offsets[1:])]
+
+        axis_tags = entry["axis_tags"].tolist()
+        deltas = iter(entry["deltas"].tolist())
+        mask = iter(entry["delta_mask"].tolist())
+        tuples = []
+        for axes, point_count in zip(entry["tuple_axes"].tolist(), entry["point_counts"].tolist()):
+            axes = {tag: tuple(axis) for tag, axis in zip(axis_tags, axes) if not np.isnan(axis[0])}
+            coordinates = [tuple(next(deltas)) if next(mask) else None for _ in range(point_count)]
+            tuples.append(TupleVariation(axes, coordinates))
+        tuple_offsets = np.concatenate(([0], np.cumsum(entry["tuple_counts"])))
+        variations = [tuples[start:end] for start, end in zip(tuple_offsets[:-1], tuple_offsets[1:])]
+    return glyph_ids, glyphs, variations
+
+def evict(cache_dir, limit=CACHE_SIZE_LIMIT):
+    entries = sorted(cache_dir.glob("*.npz"), key=lambda path: path.stat().st_mtime, reverse=True)
+    size = 0
+    for path in entries:
+        size += path.stat().st_size
+        if size > limit:
+            path.unlink()
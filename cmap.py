@@ -0,0 +1,31 @@
+class CmapIndex:
+    def __init__(self, font):
+        # Subtables decompiled from the same offset share one mapping, so index each mapping once
+        self.mappings = list({id(subtable.cmap): subtable.cmap for subtable in font["cmap"].tables}.values())
+        # glyph -> codepoints mapped to it, per mapping
+        self.reverse = []
+        for mapping in self.mappings:
+            reverse = {}
+            for codepoint, glyph in mapping.items():
+                reverse.setdefault(glyph, set()).add(codepoint)
+            self.reverse.append(reverse)
+
+    def replace(self, glyphs):
+        for mapping, reverse in zip(self.mappings, self.reverse):
+            updates = {}
+            for orig_glyph, new_glyph in glyphs.items():
+                codepoints = reverse.pop(orig_glyph, None)
+                if not codepoints:
+                    continue
+                reverse.setdefault(new_glyph, set()).update(codepoints)
+                updates.update(dict.fromkeys(codepoints, new_glyph))
+            mapping.update(updates)
+
+    def insert(self, codepoints):
+        for mapping, reverse in zip(self.mappings, self.reverse):
+            for codepoint, glyph in codepoints.items():
+                orig_glyph = mapping.get(codepoint)
+                if orig_glyph is not None:
+                    reverse[orig_glyph].discard(codepoint)
+                reverse.setdefault(glyph, set()).add(codepoint)
+            mapping.update(codepoints)
@@ -0,0 +1,154 @@
+from array import array
+
+from fontTools.ttLib.tables import ttProgram
+from fontTools.ttLib.tables._g_l_y_f import (
+    OVERLAP_COMPOUND, Glyph, GlyphComponent, GlyphCoordinates, flagOnCurve, flagOverlapSimple,
+)
+from fontTools.ttLib.tables.TupleVariation import TupleVariation
+
+from gvar import expand_deltas
+
+# Rough byte costs used to decide whether a syllable is worth rebuilding as a composite glyph:
+# a glyf header, flags, glyph index and two word arguments of a component record,
+# and the loca, hmtx and gvar entries of an extra glyph plus its tuple headers
+GLYPH_HEADER_SIZE = 10
+COMPONENT_SIZE = 8
+GLYPH_ENTRY_SIZE = 16
+TUPLE_HEADER_SIZE = 4
+
+def _contour_size(key):
+    # A flag and two coordinates per point in glyf, and two deltas per point and tuple in gvar
+    return len(key[0]) * (3 + 2 * len(key[2]))
+
+def _composite_size(component_count, tuple_count, extra_glyph):
+    size = GLYPH_HEADER_SIZE + component_count * (COMPONENT_SIZE + 2 * tuple_count)
+    if extra_glyph:
+        size += GLYPH_HEADER_SIZE + GLYPH_ENTRY_SIZE + TUPLE_HEADER_SIZE * tuple_count
+    return size
+
+def _expand_deltas(glyph, variation):
+    coordinates = list(glyph.coordinates) + [(0, 0)] * 4
+    ends = list(glyph.endPtsOfContours)
+    return [expand_deltas(v.coordinates, coordinates, ends) for v in variation]
+
+def _split_contours(glyph, variation):
+    deltas = _expand_deltas(glyph, variation)
+    axes = tuple(tuple(sorted(v.axes.items())) for v in variation)
+    contours = []
+    start = 0
+    for end in glyph.endPtsOfContours:
+        points = [(int(x), int(y)) for x, y in glyph.coordinates[start:end + 1]]
+        x_min = min(x for x, _ in points)
+        y_min = min(y for _, y in points)
+        # The component offset moves with the deltas of the first point of the contour
+        contour_deltas = [tuple(d[start:end + 1]) for d in deltas]
+        origin_deltas = [d[0] for d in contour_deltas]
+        key = (
+            tuple((x - x_min, y - y_min) for x, y in points),
+            tuple(flag & flagOnCurve for flag in glyph.flags[start:end + 1]),
+            axes,
+            tuple(
+                tuple((dx - ox, dy - oy) for dx, dy in d)
+                for d, (ox, oy) in zip(contour_deltas, origin_deltas)
+            ),
+        )
+        contours.append((key, (x_min, y_min), origin_deltas))
+        start = end + 1
+    phantom_deltas = [d[-4:] for d in deltas]
+    return contours, phantom_deltas
+
+def _build_component(glyf_table, contours, overlap):
+    glyph = Glyph()
+    coordinates = []
+    flags = []
+    ends = []
+    for points, on_curve in contours:
+        coordinates.extend(points)
+        flags.extend(on_curve)
+        ends.append(len(coordinates) - 1)
+    glyph.numberOfContours = len(ends)
+    glyph.coordinates = GlyphCoordinates(coordinates)
+    glyph.endPtsOfContours = ends
+    if overlap:
+        flags[0] |= flagOverlapSimple
+    glyph.flags = array("B", flags)
+    glyph.program = ttProgram.Program()
+    glyph.program.fromBytecode(b"")
+    glyph.recalcBounds(glyf_table)
+    return glyph
+
+def compact_glyphs(glyf_table, glyph_ids, glyphs, variations, prefix="_hangul"):
+    # Contours are shared only when their outline and every delta match after moving them to the origin
+    split = {}
+    counts = {}
+    for glyph_id, glyph, variation in zip(glyph_ids, glyphs, variations):
+        if glyph.numberOfContours <= 0:
+            continue
+        split[glyph_id] = _split_contours(glyph, variation)
+        for key in {key for key, _, _ in split[glyph_id][0]}:
+            counts[key] = counts.get(key, 0) + 1
+
+    component_ids = {}
+    components = []
+    result_glyphs = []
+    result_variations = []
+    for glyph_id, glyph, variation in zip(glyph_ids, glyphs, variations):
+        if glyph_id not in split:
+            result_glyphs.append(glyph)
+            result_variations.append(variation)
+            continue
+        contours, phantom_deltas = split[glyph_id]
+        shared = [contour for contour in contours if counts[contour[0]] > 1]
+        unique = [contour for contour in contours if counts[contour[0]] == 1]
+        # Keep the simple glyph unless sharing saves more than the component records cost
+        shared_size = sum(_contour_size(key) for key, _, _ in shared)
+        if shared_size <= _composite_size(len(shared) + bool(unique), len(variation), bool(unique)):
+            result_glyphs.append(glyph)
+            result_variations.append(variation)
+            continue
+
+        overlap = bool(glyph.flags[0] & flagOverlapSimple)
+        references = []
+        for key, offset, origin_deltas in shared:
+            if key not in component_ids:
+                component_ids[key] = f"{prefix}{len(components):04d}"
+                deltas = [list(contour_deltas) for contour_deltas in key[3]]
+                components.append((component_ids[key], [(key[0], key[1])], key[2], deltas, overlap))
+            references.append((component_ids[key], offset, origin_deltas))
+        if unique:
+            # Contours used by this glyph only stay together in one component, at their original position
+            name = f"{prefix}{len(components):04d}"
+            points = [([(x + offset[0], y + offset[1]) for x, y in key[0]], key[1]) for key, offset, _ in unique]
+            deltas = [
+                [(dx + ox, dy + oy) for key, _, origin_deltas in unique for ox, oy in [origin_deltas[i]] for dx, dy in key[3][i]]
+                for i in range(len(variation))
+            ]
+            components.append((name, points, unique[0][0][2], deltas, overlap))
+            references.append((name, (0, 0), [(0, 0)] * len(variation)))
+
+        composite = Glyph()
+        composite.numberOfContours = -1
+        composite.components = []
+        for i, (name, (x, y), _) in enumerate(references):
+            component = GlyphComponent()
+            component.glyphName = name
+            component.x = x
+            component.y = y
+            component.flags = OVERLAP_COMPOUND if overlap and i == 0 else 0
+            composite.components.append(component)
+        result_glyphs.append(composite)
+        result_variations.append([
+            TupleVariation(v.axes, [origin_deltas[i] for _, _, origin_deltas in references] + list(phantom_deltas[i]))
+            for i, v in enumerate(variation)
+        ])
+
+    component_glyphs = []
+    component_variations = []
+    for name, contours, axes, deltas, overlap in components:
+        component_glyphs.append(_build_component(glyf_table, contours, overlap))
+        component_variations.append([
+            TupleVariation(dict(tuple_axes), tuple_deltas + [(0, 0)] * 4)
+            for tuple_axes, tuple_deltas in zip(axes, deltas)
+        ])
+    component_glyph_ids = [name for name, _, _, _, _ in components]
+    return result_glyphs, result_variations, component_glyph_ids, component_glyphs, component_variations
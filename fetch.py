@@ -0,0 +1,73 @@
+import os
+from pathlib import Path
+import shutil
+import zipfile
+
+import requests
+
+from cache import file_digest
+
+CHUNK_SIZE = 1024 * 1024
+
+def _verify(path, sha256, require_pinned=False):
+    actual = file_digest(path)
+    if sha256 is None:
+        if require_pinned:
+            raise RuntimeError(f"{path.name} is not pinned, its SHA-256 is {actual}")
+        print(f"Warning: {path.name} is not pinned, its SHA-256 is {actual}")
+    elif actual != sha256:
+        raise RuntimeError(f"SHA-256 mismatch for {path.name}: expected {sha256}, got {actual}")
+
+def _download(url, path):
+    tmp_path = path.with_name(path.name + ".part")
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        expected_size = response.headers.get("Content-Length")
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+    size = tmp_path.stat().st_size
+    if expected_size is not None and size != int(expected_size):
+        tmp_path.unlink()
+        raise RuntimeError(f"Truncated download of {url}: expected {expected_size} bytes, got {size}")
+    os.replace(tmp_path, path)
+
+def _copy(src, path):
+    tmp_path = path.with_name(path.name + ".part")
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, path)
+
+def fetch_archive(url, archive_dir, sha256=None, mirror=None, require_pinned=False):
+    os.makedirs(archive_dir, exist_ok=True)
+    name = url.rsplit("/", 1)[-1]
+    path = Path(archive_dir) / name
+
+    if not path.exists():
+        if mirror is not None:
+            if not (Path(mirror) / name).exists():
+                raise RuntimeError(f"{name} is missing from the mirror {mirror}")
+            _copy(Path(mirror) / name, path)
+        else:
+            _download(url, path)
+    try:
+        _verify(path, sha256, require_pinned)
+    except RuntimeError:
+        path.unlink()
+        raise
+    return path
+
+def extract_members(archive, members, dest):
+    try:
+        with zipfile.ZipFile(archive) as z:
+            for member in members:
+                target = Path(dest) / member
+                os.makedirs(target.parent, exist_ok=True)
+                tmp_target = target.with_name(target.name + ".part")
+                # ZipFile checks the CRC of the member while it is read
+                with z.open(member) as src, open(tmp_target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.replace(tmp_target, target)
+    except zipfile.BadZipFile as e:
+        # Unpinned archives are not verified, so do not keep a broken one around for the next run
+        Path(archive).unlink()
+        raise RuntimeError(f"Broken archive {Path(archive).name}: {e}")
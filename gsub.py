@@ -0,0 +1,201 @@
+def get_gsub_feature(font, tag):
+    return next((f for f in font["GSUB"].table.FeatureList.FeatureRecord if f.FeatureTag == tag), None)
+
+def get_gsub_lookup(font, index):
+    return font["GSUB"].table.LookupList.Lookup[index]
+
+def get_substitution_lookup(font, substitution_info):
+    lookup = get_gsub_lookup(font, substitution_info["lookup"])
+    if substitution_info["lookup_type"] == 1:
+        return lookup, substitution_info
+    elif substitution_info["lookup_type"] == 6:
+        if substitution_info["subtable_format"] == 2:
+            return get_substitution_lookup(font, substitution_info["child"])
+        elif substitution_info["subtable_format"] == 3:
+            return get_substitution_lookup(font, substitution_info["child"])
+
+def add_lookup(font, tag, lookup_index):
+    feature = get_gsub_feature(font, tag)
+    lookup_list = feature.Feature.LookupListIndex
+    lookup_list.append(lookup_index)
+    lookup_list = list(set(lookup_list))
+    lookup_list.sort()
+    feature.Feature.LookupListIndex = lookup_list
+    feature.Feature.LookupCount = len(lookup_list)
+
+class _LookupIndex:
+    def __init__(self, lookup):
+        self.lookup = lookup
+        # glyph -> indices of the subtables that may match a query containing it
+        self.members = {}
+        self.subtables = []
+        if lookup.LookupType == 1:
+            for subtable_index, subtable in enumerate(lookup.SubTable):
+                self.subtables.append(None)
+                for glyph in subtable.mapping:
+                    self.members.setdefault(glyph, set()).add(subtable_index)
+        elif lookup.LookupType == 6:
+            for subtable_index, subtable in enumerate(lookup.SubTable):
+                self.subtables.append(self._index_chain(subtable_index, subtable))
+
+    def _index_chain(self, subtable_index, subtable):
+        if subtable.Format == 1:
+            coverage = set(subtable.Coverage.glyphs)
+            rules = {}
+            for ruleset_index, ruleset in enumerate(subtable.ChainSubRuleSet):
+                if ruleset is None:
+                    continue
+                for rule_index, rule in enumerate(ruleset.ChainSubRule):
+                    key = (tuple(reversed(rule.Backtrack)), tuple(rule.LookAhead))
+                    rules.setdefault(key, []).append((ruleset_index, rule_index, rule.SubstLookupRecord))
+            for glyph in coverage:
+                self.members.setdefault(glyph, set()).add(subtable_index)
+            return {"coverage": coverage, "rules": rules}
+        elif subtable.Format == 2:
+            coverage = set(subtable.Coverage.glyphs)
+            rules = {}
+            for classset_index, classset in enumerate(subtable.ChainSubClassSet):
+                if classset is None:
+                    continue
+                for rule_index, rule in enumerate(classset.ChainSubClassRule):
+                    key = (tuple(reversed(rule.Backtrack)), tuple(rule.Input), tuple(rule.LookAhead))
+                    rules.setdefault(key, []).append((classset_index, rule_index, rule.SubstLookupRecord))
+            for glyph in coverage:
+                self.members.setdefault(glyph, set()).add(subtable_index)
+            return {
+                "coverage": coverage,
+                "backtrack_classes": subtable.BacktrackClassDef.classDefs,
+                "input_classes": subtable.InputClassDef.classDefs,
+                "lookahead_classes": subtable.LookAheadClassDef.classDefs,
+                "rules": rules,
+            }
+        elif subtable.Format == 3:
+            backtrack = [set(coverage.glyphs) for coverage in reversed(subtable.BacktrackCoverage)]
+            input = [set(coverage.glyphs) for coverage in subtable.InputCoverage]
+            lookahead = [set(coverage.glyphs) for coverage in subtable.LookAheadCoverage]
+            for glyph in input[0] if input else ():
+                self.members.setdefault(glyph, set()).add(subtable_index)
+            return {"backtrack": backtrack, "input": input, "lookahead": lookahead}
+
+    def candidates(self, backtrack, input, lookahead):
+        if self.lookup.LookupType == 1:
+            glyphs = backtrack + input + lookahead
+        else:
+            glyphs = input[:1]
+        if not glyphs:
+            return range(len(self.subtables))
+        return sorted(self.members.get(glyphs[0], ()))
+
+class GsubIndex:
+    def __init__(self, font):
+        self.font = font
+        self._lookups = {}
+        self._results = {}
+
+    def _lookup_index(self, lookup_index):
+        if lookup_index not in self._lookups:
+            self._lookups[lookup_index] = _LookupIndex(get_gsub_lookup(self.font, lookup_index))
+        return self._lookups[lookup_index]
+
+    def find_substitution(self, lookup_index, backtrack, input, lookahead):
+        key = (lookup_index, tuple(backtrack), tuple(input), tuple(lookahead))
+        if key not in self._results:
+            self._results[key] = self._find_substitution(lookup_index, *key[1:])
+        return self._results[key]
+
+    def _find_substitution(self, lookup_index, backtrack, input, lookahead):
+        result = []
+        index = self._lookup_index(lookup_index)
+        lookup = index.lookup
+        for subtable_index in index.candidates(backtrack, input, lookahead):
+            subtable = lookup.SubTable[subtable_index]
+            if lookup.LookupType == 1:
+                if any(glyph not in subtable.mapping for glyph in backtrack + input + lookahead):
+                    continue
+                result.append({
+                    "lookup": lookup_index,
+                    "lookup_type": lookup.LookupType,
+                    "subtable": subtable_index,
+                    "mapping": subtable.mapping
+                })
+                continue
+
+            entry = index.subtables[subtable_index]
+            if subtable.Format == 1:
+                if any(glyph not in entry["coverage"] for glyph in input):
+                    continue
+                # TODO: Check input
+                for ruleset_index, rule_index, records in entry["rules"].get((backtrack, lookahead), ()):
+                    for substitution in records:
+                        for child in self.find_substitution(substitution.LookupListIndex, backtrack, input, lookahead):
+                            result.append({
+                                "lookup": lookup_index,
+                                "lookup_type": lookup.LookupType,
+                                "subtable": subtable_index,
+                                "subtable_format": subtable.Format,
+                                "ruleset": ruleset_index,
+                                "rule": rule_index,
+                                "child": child,
+                            })
+            elif subtable.Format == 2:
+                if any(glyph not in entry["backtrack_classes"] for glyph in backtrack):
+                    continue
+                if any(glyph not in entry["coverage"] for glyph in input):
+                    continue
+                if any(glyph not in entry["lookahead_classes"] for glyph in lookahead):
+                    continue
+                key = (
+                    tuple(entry["backtrack_classes"][glyph] for glyph in backtrack),
+                    tuple(entry["input_classes"].get(glyph, 0) for glyph in input[1:]),
+                    tuple(entry["lookahead_classes"][glyph] for glyph in lookahead),
+                )
+                for classset_index, rule_index, records in entry["rules"].get(key, ()):
+                    for substitution in records:
+                        for child in self.find_substitution(substitution.LookupListIndex, backtrack, input, lookahead):
+                            result.append({
+                                "lookup": lookup_index,
+                                "lookup_type": lookup.LookupType,
+                                "subtable": subtable_index,
+                                "subtable_format": subtable.Format,
+                                "classset": classset_index,
+                                "rule": rule_index,
+                                "child": child,
+                            })
+            elif subtable.Format == 3:
+                if (
+                    len(entry["backtrack"]) != len(backtrack) or
+                    len(entry["input"]) != len(input) or
+                    len(entry["lookahead"]) != len(lookahead)
+                ):
+                    continue
+                if (
+                    any(glyph not in coverage for glyph, coverage in zip(backtrack, entry["backtrack"])) or
+                    any(glyph not in coverage for glyph, coverage in zip(input, entry["input"])) or
+                    any(glyph not in coverage for glyph, coverage in zip(lookahead, entry["lookahead"]))
+                ):
+                    continue
+
+                for substitution_index, substitution in enumerate(subtable.SubstLookupRecord):
+                    for child in self.find_substitution(substitution.LookupListIndex, backtrack, input, lookahead):
+                        result.append({
+                            "lookup": lookup_index,
+                            "lookup_type": lookup.LookupType,
+                            "subtable": subtable_index,
+                            "subtable_format": subtable.Format,
+                            "substitution": substitution_index,
+                            "child": child
+                        })
+        return result
+
+    def find_substitutions(self, feature_tag, backtrack, input, lookahead):
+        result = []
+        for lookup_index in get_gsub_feature(self.font, feature_tag).Feature.LookupListIndex:
+            result += self.find_substitution(lookup_index, backtrack, input, lookahead)
+        return result
+
+    def find_substitution_lookups(self, feature_tag, backtrack, input, lookahead):
+        result = []
+        for subst in self.find_substitutions(feature_tag, backtrack, input, lookahead):
+            lookup, info = get_substitution_lookup(self.font, subst)
+            result.append((subst, lookup, info))
+        return result
@@ -0,0 +1,72 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from fontTools.misc.roundTools import otRound
+from fontTools.ttLib.tables.TupleVariation import TupleVariation, compileTupleVariationStore
+from fontTools.varLib.iup import iup_delta, iup_delta_optimize
+
+from transform import split_chunks
+
+def variation_size(variation, point_count, axis_tags):
+    # Point numbers shared between tuples are packed by the gvar compiler, so measure with them
+    count, tuples, data = compileTupleVariationStore(variation, point_count, axis_tags, {})
+    return len(tuples) + len(data) + 4 if count else 0
+
+def expand_deltas(deltas, coordinates, ends):
+    # Fill in the deltas of points left out of a sparse tuple, the way a renderer interpolates them
+    if None in deltas:
+        return [(otRound(x), otRound(y)) for x, y in iup_delta(deltas, coordinates, ends)]
+    return list(deltas)
+
+def optimize_tuple(v, coordinates, ends, tolerance):
+    # Deltas that were already interpolated can be dropped at other points after scaling
+    deltas = expand_deltas(v.coordinates, coordinates, ends)
+    if not any(x or y for x, y in deltas):
+        return None
+    optimized = TupleVariation(v.axes, iup_delta_optimize(deltas, coordinates, ends, tolerance))
+    axis_tags = sorted(v.axes)
+    if sum(map(len, optimized.compile(axis_tags))) < sum(map(len, v.compile(axis_tags))):
+        return optimized
+    return v
+
+def optimize_variation(variation, coordinates, ends, tolerance):
+    optimized = [optimize_tuple(v, coordinates, ends, tolerance) for v in variation]
+    return [v for v in optimized if v is not None]
+
+def _optimize_chunk(args):
+    glyphs, axis_tags, tolerance = args
+    results = []
+    for coordinates, ends, variation in glyphs:
+        optimized = optimize_variation(variation, coordinates, ends, tolerance)
+        point_count = len(coordinates)
+        results.append((optimized, variation_size(variation, point_count, axis_tags), variation_size(optimized, point_count, axis_tags)))
+    return results
+
+def optimize_variations(glyphs, variations, axis_tags, tolerance=0.5, jobs=1):
+    args = []
+    for glyph, variation in zip(glyphs, variations):
+        if glyph.numberOfContours > 0:
+            # Phantom points are handled as single point contours by iup, so their coordinates do not matter
+            coordinates = list(glyph.coordinates) + [(0, 0)] * 4
+            args.append((coordinates, list(glyph.endPtsOfContours), variation))
+        else:
+            args.append(None)
+    glyph_args = [arg for arg in args if arg is not None]
+
+    if jobs > 1 and glyph_args:
+        chunks = [(glyph_args[start:end], axis_tags, tolerance) for start, end in split_chunks(len(glyph_args), jobs)]
+        with ProcessPoolExecutor(len(chunks)) as executor:
+            results = iter([result for chunk in executor.map(_optimize_chunk, chunks) for result in chunk])
+    else:
+        results = iter(_optimize_chunk((glyph_args, axis_tags, tolerance)))
+
+    optimized = []
+    size_before = size_after = 0
+    for arg, variation in zip(args, variations):
+        if arg is None:
+            optimized.append(variation)
+            continue
+        variation, before, after = next(results)
+        optimized.append(variation)
+        size_before += before
+        size_after += after
+    return optimized, size_before, size_after
@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from fontTools.ttLib.ttFont import TTFont
+from fontTools.varLib import instancer
+
+RIBBI_STYLES = ("Regular", "Bold")
+
+def save_woff2(font, path):
+    flavor = font.flavor
+    font.flavor = "woff2"
+    font.save(path)
+    font.flavor = flavor
+
+def set_instance_names(font, family, style, postscript_name):
+    names = {
+        1: family if style in RIBBI_STYLES else f"{family} {style}",
+        2: style if style in RIBBI_STYLES else "Regular",
+        4: f"{family} {style}",
+        6: postscript_name,
+        16: family,
+        17: style,
+    }
+    name_table = font["name"]
+    # Keep the version and vendor of the variable font's unique ID, but make it unique for the instance
+    unique_id = name_table.getDebugName(3)
+    names[3] = f"{unique_id.rsplit(';', 1)[0]};{postscript_name}" if unique_id and ";" in unique_id else postscript_name
+    # The variations PostScript name prefix only belongs in the variable font
+    name_table.removeNames(nameID=25)
+    platforms = {(record.platformID, record.platEncID, record.langID) for record in name_table.names}
+    for nameID, value in names.items():
+        for platformID, platEncID, langID in platforms:
+            name_table.setName(value, nameID, platformID, platEncID, langID)
+    instancer.setRibbiBits(font)
+
+def _build_instance(args):
+    path, output_dir, family, style, postscript_name, coordinates = args
+    font = TTFont(path)
+    instance = instancer.instantiateVariableFont(font, coordinates, inplace=True)
+    set_instance_names(instance, family, style, postscript_name)
+    ttf_path = output_dir / f"{postscript_name}.ttf"
+    woff2_path = output_dir / f"{postscript_name}.woff2"
+    instance.save(ttf_path)
+    save_woff2(instance, woff2_path)
+    return [ttf_path, woff2_path]
+
+def _build_woff2(args):
+    path, = args
+    woff2_path = path.with_suffix(".woff2")
+    save_woff2(TTFont(path), woff2_path)
+    return [woff2_path]
+
+def build_instances(path, output_dir, family, jobs=1):
+    font = TTFont(path)
+    tasks = [(_build_woff2, (path,))]
+    for instance in font["fvar"].instances:
+        style = font["name"].getDebugName(instance.subfamilyNameID)
+        postscript_name = font["name"].getDebugName(instance.postscriptNameID) or f"{family.replace(' ', '')}-{style}"
+        tasks.append((_build_instance, (path, output_dir, family, style, postscript_name, instance.coordinates)))
+
+    with ProcessPoolExecutor(max(1, jobs)) as executor:
+        futures = [executor.submit(function, args) for function, args in tasks]
+        return [output for future in futures for output in future.result()]
@@ -0,0 +1,338 @@
+from contextlib import nullcontext
+import copy
+from datetime import datetime
+from itertools import chain
+import os
+from pathlib import Path
+import time
+
+from fontTools.ttLib.tables.DefaultTable import DefaultTable
+from fontTools.ttLib.ttFont import TTFont
+
+from cache import cache_key, load_glyphs, store_glyphs
+from cmap import CmapIndex
+from composite import compact_glyphs
+from fetch import extract_members, fetch_archive
+from gsub import GsubIndex
+from gvar import optimize_variations
+from transform import transform_glyphs, transform_variations
+from variants import FEATURES
+
+FONT_VERSION = "1.000"
+
+FIRA_CODE_VERSION = "6.2"
+PRETENDARD_VERSION = "1.3.6"
+CREATED_AT = datetime.strptime("2023-02-13 12:00:00", "%Y-%m-%d %H:%M:%S")
+MODIFIED_AT = datetime.strptime("2023-02-13 12:00:00", "%Y-%m-%d %H:%M:%S")
+
+FIRA_CODE_URL = f"https://github.com/tonsky/FiraCode/releases/download/{FIRA_CODE_VERSION}/Fira_Code_v{FIRA_CODE_VERSION}.zip"
+PRETENDARD_URL = f"https://github.com/orioncactus/pretendard/releases/download/v{PRETENDARD_VERSION}/Pretendard-{PRETENDARD_VERSION}.zip"
+# SHA-256 of the release archives, pinned per version. Versions without a pin only print a warning unless --require-pinned is passed
+FIRA_CODE_SHA256 = {
+}
+PRETENDARD_SHA256 = {
+}
+
+CACHE_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / ".cache"
+BUILD_DIR = Path(os.path.dirname(os.path.realpath(__file__))) / "build"
+CONFIG_PATH = Path(os.path.dirname(os.path.realpath(__file__))) / "variants.toml"
+FIRA_CODE_CACHE = CACHE_DIR / "fira"
+PRETENDARD_CACHE = CACHE_DIR / "pretendard"
+ARCHIVE_CACHE = CACHE_DIR / "archives"
+GLYPH_CACHE = CACHE_DIR / "glyphs"
+FIRA_CODE_MEMBER = "variable_ttf/FiraCode-VF.ttf"
+PRETENDARD_MEMBER = "public/variable/PretendardVariable.ttf"
+FIRA_CODE_FONT = FIRA_CODE_CACHE / FIRA_CODE_MEMBER
+PRETENDARD_FONT = PRETENDARD_CACHE / PRETENDARD_MEMBER
+
+# Tables of Fira Code used in the result
+TABLES = [
+    "head", "hhea", "maxp", "OS/2", "hmtx", "cmap", "prep", "loca", "glyf", "name", "post",
+    "gasp", "GDEF", "GPOS", "GSUB", "HVAR", "MVAR", "STAT", "avar", "fvar", "gvar",
+]
+# Tables patched differently by each variant, every other table is shared between variants
+VARIANT_TABLES = {"head", "hhea", "OS/2", "hmtx", "cmap", "name", "post", "GSUB"}
+# Tables never modified by the build, copied with the exact bytes of Fira Code instead of being decompiled and compiled again.
+# fvar is not one of them because compiling gvar reads its axes
+PASSTHROUGH_TABLES = {"prep", "gasp", "GDEF", "GPOS", "HVAR", "MVAR", "STAT", "avar"}
+HANGUL_CODEPOINTS = list(chain(range(0x3131, 0x3163), range(0xAC00, 0xD7A4)))
+HANGUL_GLYPH_IDS = [f"uni{codepoint:X}" for codepoint in HANGUL_CODEPOINTS]
+
+class TimedFont(TTFont):
+    # Records how long compiling each table takes when saving
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compile_times = {}
+
+    def getTableData(self, tag):
+        start = time.perf_counter()
+        data = super().getTableData(tag)
+        self.compile_times[tag] = time.perf_counter() - start
+        return data
+
+class SourceFont(TTFont):
+    # Records the glyf and gvar entries read from a lazily loaded font,
+    # since an empty glyph looks the same whether it was decompiled or not
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.decompiled = {"glyf": set(), "gvar": set()}
+
+    def glyph(self, glyph_id):
+        self.decompiled["glyf"].add(glyph_id)
+        return self["glyf"][glyph_id]
+
+    def variation(self, glyph_id):
+        self.decompiled["gvar"].add(glyph_id)
+        return self["gvar"].variations[glyph_id]
+
+def _stage(profiler, name, **kwargs):
+    # Steps can run without a profiler, their records are then thrown away
+    if profiler is None:
+        return nullcontext({})
+    return profiler.stage(name, **kwargs)
+
+def raw_table(font, tag):
+    table = DefaultTable(tag)
+    table.data = font.reader[tag]
+    return table
+
+def count_decompiled(font):
+    return len(font.decompiled["glyf"]), len(font.decompiled["gvar"])
+
+def find_name(font, nameID):
+    return next(name.string.decode("utf_16_be") for name in font["name"].names if name.nameID == nameID)
+
+def encode_name(platformID, value):
+    if platformID == 3:
+        return value.encode("utf_16_be")
+    else:
+        return bytes(value, "utf_8")
+
+def set_names(font, firacode, pretendard, variant):
+    family = variant["family"]
+    name = variant["name"]
+    version = variant["version"]
+    for record in font["name"].names:
+        if record.nameID == 0:
+            firacode_copyright = find_name(firacode, 0)
+            pretendard_copyright = find_name(pretendard, 0)
+            record.string = encode_name(record.platformID, f"FiraCode - {firacode_copyright}, Pretendard - {pretendard_copyright}")
+        if record.nameID == 1:
+            record.string = encode_name(record.platformID, family)
+        elif record.nameID == 2:
+            record.string = encode_name(record.platformID, "Regular")
+        elif record.nameID == 3:
+            record.string = encode_name(record.platformID, f"{version};RMGP;{name}Variable")
+        elif record.nameID == 4:
+            record.string = encode_name(record.platformID, family)
+        elif record.nameID == 5:
+            record.string = encode_name(record.platformID, f"Version {version}")
+        elif record.nameID == 6:
+            record.string = encode_name(record.platformID, f"{name}-Light")
+        elif record.nameID == 7:
+            firacode_trademark = find_name(firacode, 7)
+            pretendard_trademark = find_name(pretendard, 7)
+            record.string = encode_name(record.platformID, f"FiraCode - {firacode_trademark}, Pretendard - {pretendard_trademark}")
+        elif record.nameID == 8:
+            firacode_manufacturer = find_name(firacode, 8)
+            pretendard_manufacturer = find_name(pretendard, 8)
+            record.string = encode_name(record.platformID, f"{firacode_manufacturer}, {pretendard_manufacturer}, Joonmo Yang")
+        elif record.nameID == 9:
+            firacode_designer = find_name(firacode, 9)
+            pretendard_designer = find_name(pretendard, 9)
+            record.string = encode_name(record.platformID, f"FiraCode - {firacode_designer}; Pretendard - {pretendard_designer}")
+        elif record.nameID == 11:
+            record.string = encode_name(record.platformID, "https://github.com/remagpie/PreFiraCode")
+        elif record.nameID == 12:
+            record.string = encode_name(record.platformID, "https://github.com/remagpie/PreFiraCode")
+        elif record.nameID == 13:
+            record.string = encode_name(record.platformID, "This Font Software is licensed under the SIL Open Font License, Version 1.1. This license is available with a FAQ at: http://scripts.sil.org/OFL")
+        elif record.nameID == 14:
+            record.string = encode_name(record.platformID, "http://scripts.sil.org/OFL")
+        elif record.nameID == 16:
+            record.string = encode_name(record.platformID, family)
+        elif record.nameID == 17:
+            record.string = encode_name(record.platformID, "Light")
+        elif record.nameID == 25:
+            record.string = encode_name(record.platformID, name)
+        elif record.nameID == 262:
+            record.string = encode_name(record.platformID, f"{name}-Light")
+        elif record.nameID == 263:
+            record.string = encode_name(record.platformID, f"{name}-Regular")
+        elif record.nameID == 264:
+            record.string = encode_name(record.platformID, f"{name}-Medium")
+        elif record.nameID == 265:
+            record.string = encode_name(record.platformID, f"{name}-SemiBold")
+        elif record.nameID == 266:
+            record.string = encode_name(record.platformID, f"{name}-Bold")
+
+def fetch_sources(mirror=None, require_pinned=False, profiler=None):
+    with _stage(profiler, "download"):
+        if not FIRA_CODE_FONT.exists():
+            print("Downloading Fira Code")
+            archive = fetch_archive(FIRA_CODE_URL, ARCHIVE_CACHE, FIRA_CODE_SHA256.get(FIRA_CODE_VERSION), mirror, require_pinned)
+            extract_members(archive, [FIRA_CODE_MEMBER], FIRA_CODE_CACHE)
+
+        if not PRETENDARD_FONT.exists():
+            print("Downloading Pretendard")
+            archive = fetch_archive(PRETENDARD_URL, ARCHIVE_CACHE, PRETENDARD_SHA256.get(PRETENDARD_VERSION), mirror, require_pinned)
+            extract_members(archive, [PRETENDARD_MEMBER], PRETENDARD_CACHE)
+
+def load_sources(profiler=None):
+    with _stage(profiler, "load"):
+        firacode = TTFont(FIRA_CODE_FONT)
+        # Only the hangul glyphs of Pretendard are used, so decompile its glyf/gvar entries on demand
+        pretendard = SourceFont(PRETENDARD_FONT, lazy=True)
+        firacode["gvar"].ensureDecompiled()
+    return firacode, pretendard
+
+def scaling_context(firacode, pretendard):
+    # Calculate glyph scaling factor with letter M
+    fira_M = firacode["glyf"]["M"]
+    pretendard_M = pretendard.glyph("M")
+    glyph_scale = (fira_M.yMax - fira_M.yMin) / (pretendard_M.yMax - pretendard_M.yMin)
+
+    # Calculate delta scaling factor
+    fira_weight = next(axis for axis in firacode["fvar"].axes if axis.axisTag == "wght")
+    pretendard_weight = next(axis for axis in pretendard["fvar"].axes if axis.axisTag == "wght")
+    delta_scale = fira_weight.maxValue / pretendard_weight.maxValue
+    ## default weight of firacode / default weight of pretendard = 300 / 400 = 0.75
+    delta_scale = delta_scale * glyph_scale * 0.75
+
+    # Calculate width of single character
+    unit_width = firacode["hmtx"]["M"][0]
+    return {"glyph_scale": glyph_scale, "delta_scale": delta_scale, "unit_width": unit_width}
+
+def insert_hangul(firacode, pretendard, context, jobs=1, use_cache=True, iup_tolerance=0.5, compact=False, profiler=None):
+    # The outlines and variations are the same for every variant, so they go into the shared tables of Fira Code
+    with _stage(profiler, "hangul", glyphs=len(HANGUL_GLYPH_IDS)) as record:
+        key = cache_key(
+            [FIRA_CODE_FONT, PRETENDARD_FONT],
+            glyph_scale=context["glyph_scale"],
+            delta_scale=context["delta_scale"],
+            iup_tolerance=iup_tolerance,
+            compact=compact,
+        )
+        cached = load_glyphs(GLYPH_CACHE, key) if use_cache else None
+        if cached is not None:
+            print("Using cached hangul glyphs")
+            glyph_ids, glyphs, variations = cached
+        else:
+            glyph_ids = HANGUL_GLYPH_IDS
+            glyphs = transform_glyphs([pretendard.glyph(glyph_id) for glyph_id in HANGUL_GLYPH_IDS], context["glyph_scale"], jobs)
+            variations = transform_variations([pretendard.variation(glyph_id) for glyph_id in HANGUL_GLYPH_IDS], context["delta_scale"], jobs)
+            if compact:
+                glyphs, variations, component_ids, component_glyphs, component_variations = compact_glyphs(firacode["glyf"], glyph_ids, glyphs, variations)
+                composite_count = sum(glyph.isComposite() for glyph in glyphs)
+                print(f"Rebuilt {composite_count} hangul glyphs as composites of {len(component_ids)} component glyphs")
+                record["composite_glyphs"] = composite_count
+                record["component_glyphs"] = len(component_ids)
+                glyph_ids = glyph_ids + component_ids
+                glyphs = glyphs + component_glyphs
+                variations = variations + component_variations
+            if iup_tolerance is not None:
+                # Rounding the scaled deltas leaves many of them zero or interpolatable
+                axis_tags = [axis.axisTag for axis in firacode["fvar"].axes]
+                variations, size_before, size_after = optimize_variations(glyphs, variations, axis_tags, iup_tolerance, jobs)
+                saved = size_before - size_after
+                print(f"Optimized hangul gvar data from {size_before} to {size_after} bytes, saved {saved} bytes ({saved / max(size_before, 1):.1%})")
+                record["gvar_size_before"] = size_before
+                record["gvar_size_after"] = size_after
+        for glyph_id, glyph, variation in zip(glyph_ids, glyphs, variations):
+            firacode["glyf"][glyph_id] = glyph
+            firacode["gvar"].variations.data[glyph_id] = variation
+        if cached is None:
+            # Bounds of composite glyphs need their components in the glyf table
+            for glyph in glyphs:
+                if glyph.isComposite():
+                    glyph.recalcBounds(firacode["glyf"])
+            if use_cache:
+                store_glyphs(GLYPH_CACHE, key, firacode["glyf"], glyph_ids, glyphs, variations)
+    return glyph_ids[len(HANGUL_GLYPH_IDS):]
+
+def copy_tables(firacode, variant, profiler=None):
+    # The shared tables already hold the hangul glyphs and variations, so only copy what the variant patches
+    with _stage(profiler, "copy", variant=variant["name"]):
+        result = TimedFont()
+        for tag in TABLES:
+            if tag in VARIANT_TABLES:
+                result[tag] = copy.deepcopy(firacode[tag])
+            elif tag in PASSTHROUGH_TABLES:
+                result[tag] = raw_table(firacode, tag)
+            else:
+                result[tag] = firacode[tag]
+        result.setGlyphOrder(firacode.glyphOrder)
+    return result
+
+def apply_names(result, firacode, pretendard, context, variant, profiler=None):
+    with _stage(profiler, "names", variant=variant["name"]):
+        result["head"].fontRevision = float(variant["version"])
+        result["head"].created = int(CREATED_AT.timestamp() - datetime.strptime("1904-01-01 00:00:00", "%Y-%m-%d %H:%M:%S").timestamp())
+        result["head"].modified = int(MODIFIED_AT.timestamp() - datetime.strptime("1904-01-01 00:00:00", "%Y-%m-%d %H:%M:%S").timestamp())
+        result["post"].isFixedPitch = 0
+        result["OS/2"].xAvgCharWidth = context["unit_width"]
+        result["OS/2"].panose.bProportion = 3
+        result["OS/2"].ulUnicodeRange2 | (1 << 20)
+        result["OS/2"].ulUnicodeRange2 | (1 << 24)
+        result["OS/2"].ulCodePageRange1 | (1 << 19)
+        result["OS/2"].ulCodePageRange1 | (1 << 21)
+        result["OS/2"].achVendID = "RMGP"
+        set_names(result, firacode, pretendard, variant)
+
+def apply_features(result, variant, profiler=None):
+    with _stage(profiler, "gsub", variant=variant["name"]):
+        cmap = CmapIndex(result)
+        gsub = GsubIndex(result)
+        for feature in variant["features"]:
+            FEATURES[feature](result, cmap, gsub)
+        cmap.insert(dict(zip(HANGUL_CODEPOINTS, HANGUL_GLYPH_IDS)))
+
+def apply_metrics(result, firacode, context, variant, component_ids=(), profiler=None):
+    with _stage(profiler, "metrics", glyphs=len(HANGUL_GLYPH_IDS), variant=variant["name"]):
+        width = round(context["unit_width"] * variant["hangul_width"])
+        for glyph_id in HANGUL_GLYPH_IDS:
+            glyph = result["glyf"][glyph_id]
+            result["hmtx"][glyph_id] = (width, (width - (glyph.xMax - glyph.xMin)) // 2)
+        # Components of composite hangul glyphs share the advance width, so hmtx can still leave out the trailing advances
+        for glyph_id in component_ids:
+            result["hmtx"][glyph_id] = (width, result["glyf"][glyph_id].xMin)
+
+        result["head"].xMin = firacode["head"].xMin
+        result["head"].yMin = firacode["head"].yMin
+        result["head"].xMax = firacode["head"].xMax
+        result["head"].yMax = firacode["head"].yMax
+        result["hhea"].advanceWidthMax = firacode["hhea"].advanceWidthMax
+        result["hhea"].minLeftSideBearing = firacode["hhea"].minLeftSideBearing
+        result["hhea"].minRightSideBearing = firacode["hhea"].minRightSideBearing
+        result["hhea"].xMaxExtent = firacode["hhea"].xMaxExtent
+        for glyph_id in HANGUL_GLYPH_IDS:
+            glyph = result["glyf"][glyph_id]
+            result["head"].xMin = min(result["head"].xMin, glyph.xMin)
+            result["head"].yMin = min(result["head"].yMin, glyph.yMin)
+            result["head"].xMax = min(result["head"].xMax, glyph.xMax)
+            result["head"].yMax = min(result["head"].yMax, glyph.yMax)
+
+            hmtx = result["hmtx"][glyph_id]
+            result["hhea"].advanceWidthMax = max(result["hhea"].advanceWidthMax, hmtx[0])
+            result["hhea"].minLeftSideBearing = min(result["hhea"].minLeftSideBearing, hmtx[1])
+            result["hhea"].minRightSideBearing = min(result["hhea"].minRightSideBearing, hmtx[0] - (hmtx[1] + glyph.xMax - glyph.xMin))
+            result["hhea"].xMaxExtent = max(result["hhea"].xMaxExtent, hmtx[1] + glyph.xMax - glyph.xMin)
+
+def save(result, variant, output_dir=BUILD_DIR, profiler=None):
+    path = output_dir / f"{variant['name']}-VF.ttf"
+    with _stage(profiler, "save", glyphs=len(result.getGlyphOrder()), variant=variant["name"]) as record:
+        os.makedirs(output_dir, exist_ok=True)
+        result.save(path)
+        # Compare with the table sizes of an earlier build to see what the optimizations saved
+        with TTFont(path, lazy=True) as saved:
+            record["table_sizes"] = {tag: saved.reader.tables[tag].length for tag in sorted(saved.reader.keys())}
+        compile_times = getattr(result, "compile_times", {})
+        record["compile_times"] = {tag: compile_times[tag] for tag in sorted(compile_times)}
+    return path
+
+def build_variant(firacode, pretendard, context, variant, component_ids=(), output_dir=BUILD_DIR, profiler=None):
+    result = copy_tables(firacode, variant, profiler)
+    apply_names(result, firacode, pretendard, context, variant, profiler)
+    apply_features(result, variant, profiler)
+    apply_metrics(result, firacode, context, variant, component_ids, profiler)
+    return save(result, variant, output_dir, profiler)
@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def _maxrss(who):
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale
+
+def reset_peak_rss():
+    # Linux resets the VmHWM high-water mark of the process to its current RSS
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+def peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return _maxrss(resource.RUSAGE_SELF) if resource is not None else None
+
+def cpu_time():
+    # Include the time spent in worker processes of --jobs
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+class BuildProfiler:
+    def __init__(self, output_dir, cprofile_stage=None, tracemalloc_stage=None):
+        self.output_dir = output_dir
+        self.cprofile_stage = cprofile_stage
+        self.tracemalloc_stage = tracemalloc_stage
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, glyphs=None, variant=None):
+        profiler = cProfile.Profile() if name == self.cprofile_stage else None
+        if name == self.tracemalloc_stage:
+            tracemalloc.start()
+        # Without a resettable high-water mark, the lifetime peak only belongs to this stage if it grew during it
+        rss_reset = reset_peak_rss()
+        rss_start = None if rss_reset else peak_rss()
+        workers_start = _maxrss(resource.RUSAGE_CHILDREN) if resource is not None else None
+        wall_start = time.perf_counter()
+        cpu_start = cpu_time()
+        # Extra statistics of the stage can be added to the yielded record
+        record = {"stage": name, "variant": variant}
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - wall_start
+            rss = peak_rss()
+            # Only the largest peak of all reaped workers is known, so it is reported for the stage that raised it
+            workers = _maxrss(resource.RUSAGE_CHILDREN) if resource is not None else None
+            record.update({
+                "wall_time": wall,
+                "cpu_time": cpu_time() - cpu_start,
+                "peak_rss": rss if rss_reset or rss is None or rss > rss_start else None,
+                "worker_peak_rss": workers if workers and workers > workers_start else None,
+                "glyphs": glyphs,
+                "glyphs_per_second": glyphs / wall if glyphs and wall > 0 else None,
+            })
+            self.stages.append(record)
+            suffix = name if variant is None else f"{name}-{variant}"
+
+            if profiler is not None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                profiler.dump_stats(self.output_dir / f"profile-{suffix}.prof")
+            if name == self.tracemalloc_stage:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                record["traced_peak"] = peak
+                os.makedirs(self.output_dir, exist_ok=True)
+                with open(self.output_dir / f"tracemalloc-{suffix}.txt", "w") as f:
+                    f.write(f"Peak traced memory: {peak} bytes\n")
+                    for stat in snapshot.statistics("lineno")[:50]:
+                        f.write(f"{stat}\n")
+
+    def report(self, path):
+        os.makedirs(path.parent, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"stages": self.stages}, f, indent=2)
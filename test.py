@@ -1,13 +1,30 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
 import os
 from pathlib import Path
+import shutil
+import sys
 
-from PIL import Image, ImageDraw, ImageFont
+from fontTools.ttLib.ttFont import TTFont
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from cache import file_digest
 
 ROOT_DIR = Path(os.path.dirname(os.path.realpath(__file__)))
+FONT_PATH = ROOT_DIR / "build" / "PreFiraCode-VF.ttf"
+GOLDEN_DIR = ROOT_DIR / "golden"
+OUTPUT_DIR = ROOT_DIR / "build" / "test"
+RENDER_CACHE = ROOT_DIR / ".cache" / "renders"
+
+FONT_SIZES = [16, 32, 96]
+# Pixels whose blurred grayscale values differ by more than PIXEL_TOLERANCE count as changed,
+# and a render fails once more than DIFF_THRESHOLD of its pixels changed
+PIXEL_TOLERANCE = 16
+DIFF_THRESHOLD = 0.0001
 
-font_size = 96
-font = ImageFont.truetype((ROOT_DIR / "build" / "PreFiraCode-VF.ttf").as_posix(), font_size)
-padding = font_size
 dataset = [
     # Alphabet
     ["a", "b", "c", "d", "e", "f", "g", "h", "i"],
@@ -35,20 +52,93 @@ dataset = [
     # ss05
     ["@", "~@"],
 ]
-line_len = [sum(len(word) for word in line) + len(line) - 1 for line in dataset]
 
-width = max(line_len) * font_size + padding * 2
-height = len(dataset) * font_size + padding * 2
-img = Image.new('RGB', (width, height), "white")
+def render(font_path, font_size, coordinates):
+    font = ImageFont.truetype(font_path.as_posix(), font_size)
+    font.set_variation_by_axes(coordinates)
+    padding = font_size
+    line_len = [sum(len(word) for word in line) + len(line) - 1 for line in dataset]
+
+    width = max(line_len) * font_size + padding * 2
+    height = len(dataset) * font_size + padding * 2
+    img = Image.new('RGB', (width, height), "white")
+
+    draw = ImageDraw.Draw(img)
+
+    for i, line in enumerate(dataset):
+        top = padding + i * font_size
+        left = font_size / 2
+        for word in line:
+            l, t, r, b = font.getbbox(word)
+            draw.text((left, top), word, "black", font)
+            left += (r - l) + font_size
+
+    return img
+
+def image_diff(img, golden):
+    if img.size != golden.size:
+        return float("inf")
+    # Blur before comparing so that sub-pixel antialiasing changes do not count as regressions
+    a = np.asarray(img.convert("L").filter(ImageFilter.GaussianBlur(1)), dtype=np.float64)
+    b = np.asarray(golden.convert("L").filter(ImageFilter.GaussianBlur(1)), dtype=np.float64)
+    return float(np.mean(np.abs(a - b) > PIXEL_TOLERANCE))
+
+def render_digest(path):
+    # Renders only depend on the font and the dataset
+    return hashlib.sha256(f"{json.dumps(dataset)}{file_digest(path)}".encode()).hexdigest()
+
+def _run_case(args):
+    font_path, cache_dir, name, font_size, coordinates = args
+    file_name = f"{name}-{font_size}.png"
+    cached_path = cache_dir / file_name
+    if not cached_path.exists():
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cached_path.with_suffix(".tmp.png")
+        render(font_path, font_size, coordinates).save(tmp_path)
+        os.replace(tmp_path, cached_path)
+    output_path = OUTPUT_DIR / file_name
+    shutil.copyfile(cached_path, output_path)
+
+    golden_path = GOLDEN_DIR / file_name
+    if not golden_path.exists():
+        return {"case": file_name, "status": "missing", "diff": None}
+    with Image.open(output_path) as img, Image.open(golden_path) as golden:
+        diff = image_diff(img, golden)
+    return {"case": file_name, "status": "pass" if diff <= DIFF_THRESHOLD else "fail", "diff": diff}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of processes used to render")
+    parser.add_argument("--update", action="store_true", help="replace the golden images with the current renders")
+    args = parser.parse_args()
+
+    font = TTFont(FONT_PATH)
+    axes = [axis.axisTag for axis in font["fvar"].axes]
+    instances = [
+        (font["name"].getDebugName(instance.subfamilyNameID), [instance.coordinates[tag] for tag in axes])
+        for instance in font["fvar"].instances
+    ]
+    cache_dir = RENDER_CACHE / render_digest(FONT_PATH)
+    cases = [(FONT_PATH, cache_dir, name, font_size, coordinates) for name, coordinates in instances for font_size in FONT_SIZES]
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with ProcessPoolExecutor(max(1, args.jobs)) as executor:
+        results = list(executor.map(_run_case, cases))
+
+    if args.update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        for result in results:
+            shutil.copyfile(OUTPUT_DIR / result["case"], GOLDEN_DIR / result["case"])
+            result["status"] = "updated"
 
-draw = ImageDraw.Draw(img)
+    for result in results:
+        diff = "" if result["diff"] is None else f" ({result['diff']:.4%} changed)"
+        print(f"{result['status']:>8} {result['case']}{diff}")
+    with open(OUTPUT_DIR / "report.json", "w") as f:
+        json.dump({"threshold": DIFF_THRESHOLD, "results": results}, f, indent=2)
 
-for i, line in enumerate(dataset):
-    top = padding + i * font_size
-    left = font_size / 2
-    for word in line:
-        l, t, r, b = font.getbbox(word)
-        draw.text((left, top), word, "black", font)
-        left += (r - l) + font_size
+    if any(result["status"] in ("fail", "missing") for result in results):
+        sys.exit(1)
 
-img.show()
+if __name__ == "__main__":
+    main()
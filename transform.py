@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
+import numpy as np
+
+def scale_coordinates(coordinates, offsets, scale):
+    # np.round rounds half to even, same as the builtin round() on floats
+    coordinates = np.round(coordinates * scale)
+    mins = np.minimum.reduceat(coordinates, offsets[:-1])
+    maxs = np.maximum.reduceat(coordinates, offsets[:-1])
+    return coordinates, mins, maxs
+
+def scale_deltas(deltas, scale):
+    return np.round(deltas * scale).astype(np.int64)
+
+def _scale_coordinates_chunk(args):
+    buffer, offsets, scale = args
+    coordinates = np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)
+    coordinates, mins, maxs = scale_coordinates(coordinates, offsets, scale)
+    return coordinates.tobytes(), mins.tobytes(), maxs.tobytes()
+
+def _scale_deltas_chunk(args):
+    buffer, scale = args
+    deltas = np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)
+    return scale_deltas(deltas, scale).tobytes()
+
+def split_chunks(count, jobs):
+    bounds = np.linspace(0, count, min(jobs, count) + 1).astype(np.int64)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if start < end]
+
+def transform_glyphs(glyphs, scale, jobs=1):
+    lengths = [len(glyph.coordinates) for glyph in glyphs]
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    coordinates = np.concatenate([np.frombuffer(glyph.coordinates.array, dtype=np.float64) for glyph in glyphs]).reshape(-1, 2)
+
+    if jobs > 1:
+        chunks = split_chunks(len(glyphs), jobs)
+        args = [
+            (coordinates[offsets[start]:offsets[end]].tobytes(), offsets[start:end + 1] - offsets[start], scale)
+            for start, end in chunks
+        ]
+        with ProcessPoolExecutor(len(chunks)) as executor:
+            results = list(executor.map(_scale_coordinates_chunk, args))
+        coordinates = np.frombuffer(b"".join(r[0] for r in results), dtype=np.float64).reshape(-1, 2)
+        mins = np.frombuffer(b"".join(r[1] for r in results), dtype=np.float64).reshape(-1, 2)
+        maxs = np.frombuffer(b"".join(r[2] for r in results), dtype=np.float64).reshape(-1, 2)
+    else:
+        coordinates, mins, maxs = scale_coordinates(coordinates, offsets, scale)
+
+    for i, glyph in enumerate(glyphs):
+        glyph.coordinates = GlyphCoordinates()
+        glyph.coordinates.array.frombytes(coordinates[offsets[i]:offsets[i + 1]].tobytes())
+        glyph.xMin = int(mins[i][0])
+        glyph.yMin = int(mins[i][1])
+        glyph.xMax = int(maxs[i][0])
+        glyph.yMax = int(maxs[i][1])
+    return glyphs
+
+def transform_variations(variations, scale, jobs=1):
+    deltas = np.array(
+        [coordinate for variation in variations for v in variation for coordinate in v.coordinates if coordinate is not None],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+
+    if jobs > 1 and len(deltas) > 0:
+        args = [(deltas[start:end].tobytes(), scale) for start, end in split_chunks(len(deltas), jobs)]
+        with ProcessPoolExecutor(len(args)) as executor:
+            deltas = np.frombuffer(b"".join(executor.map(_scale_deltas_chunk, args)), dtype=np.int64)
+    else:
+        deltas = scale_deltas(deltas, scale)
+    deltas = iter(deltas.reshape(-1, 2).tolist())
+
+    for variation in variations:
+        for v in variation:
+            v.coordinates = [None if coordinate is None else tuple(next(deltas)) for coordinate in v.coordinates]
+    return variations
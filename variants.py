@@ -0,0 +1,102 @@
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+from gsub import add_lookup
+
+def enable_cv02(font, cmap, gsub):
+    cmap.replace({
+        "g": "g.cv02",
+        "gbreve": "gbreve.cv02",
+        "gcircumflex": "gcircumflex.cv02",
+        "uni0123": "uni0123.cv02",
+        "gdotaccent": "gdotaccent.cv02",
+    })
+
+def enable_ss01(font, cmap, gsub):
+    cmap.replace({"r": "r.ss01"})
+
+def enable_ss02(font, cmap, gsub):
+    _, lookup, info = gsub.find_substitution_lookups("calt", [], ["greater"], ["equal"])[0]
+    lookup.SubTable[info["subtable"]].mapping["equal"] = "greater_equal.ss02"
+    _, lookup, info = gsub.find_substitution_lookups("calt", [], ["less"], ["equal"])[0]
+    lookup.SubTable[info["subtable"]].mapping["equal"] = "less_equal.ss02"
+
+def enable_ss03(font, cmap, gsub):
+    cmap.replace({"ampersand": "ampersand.ss03"})
+    # TODO: sub ampersand_ampersand.liga by ampersand.ss03;
+    subst, _, _ = gsub.find_substitution_lookups("ss03", [], ["ampersand.spacer"], ["ampersand.ss03"])[0]
+    add_lookup(font, "calt", subst["lookup"])
+
+def enable_ss05(font, cmap, gsub):
+    cmap.replace({"at": "at.ss05"})
+    # TODO: sub asciitilde.spacer' asciitilde_at.liga by asciitilde;
+    # TODO: sub asciitilde asciitilde_at.liga' by at.ss05;
+
+# Features that can be turned on by default, in the order they are applied
+FEATURES = {
+    "cv02": enable_cv02,
+    "ss01": enable_ss01,
+    "ss02": enable_ss02,
+    "ss03": enable_ss03,
+    "ss05": enable_ss05,
+}
+
+# Keys accepted in the [[variants]] entries of the config
+VARIANT_KEYS = {"family", "name", "version", "features", "hangul_width"}
+
+def make_variant(family, version, features=tuple(FEATURES), hangul_width=2, name=None):
+    unknown = [feature for feature in features if feature not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features for {family}: {', '.join(unknown)}")
+    return {
+        # Used for the output file name and the PostScript names
+        "name": name or family.replace(" ", ""),
+        "family": family,
+        "version": version,
+        "features": [feature for feature in FEATURES if feature in features],
+        # Advance width of hangul glyphs, in multiples of the Fira Code advance width
+        "hangul_width": hangul_width,
+    }
+
+def load_variants(path, version):
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    for i, variant in enumerate(config.get("variants", [])):
+        label = variant.get("family", f"entry {i + 1}")
+        unknown = sorted(set(variant) - VARIANT_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown keys for {label} in {path}: {', '.join(unknown)}")
+        if "family" not in variant:
+            raise ValueError(f"Missing family for {label} in {path}")
+        for key in ("family", "name", "version"):
+            if key in variant and not isinstance(variant[key], str):
+                raise ValueError(f"{key} of {label} in {path} must be a string")
+        features = variant.get("features", [])
+        if not isinstance(features, list) or not all(isinstance(feature, str) for feature in features):
+            raise ValueError(f"features of {label} in {path} must be a list of feature tags")
+        try:
+            # Used as the fontRevision of the head table
+            float(variant.get("version", version))
+        except ValueError:
+            raise ValueError(f"version of {label} in {path} must be a number, got {variant['version']!r}") from None
+        hangul_width = variant.get("hangul_width", 2)
+        if isinstance(hangul_width, bool) or not isinstance(hangul_width, (int, float)) or hangul_width <= 0:
+            raise ValueError(f"hangul_width of {label} in {path} must be a positive number, got {hangul_width!r}")
+    variants = [make_variant(**{"version": version, **variant}) for variant in config.get("variants", [])]
+    if not variants:
+        raise ValueError(f"No variants in {path}")
+    names = [variant["name"] for variant in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate variant names in {path}: {', '.join(duplicates)}")
+    return variants
+
+def select_variants(variants, names=None):
+    if not names:
+        return variants
+    unknown = set(names) - {variant["name"] for variant in variants}
+    if unknown:
+        raise ValueError(f"Unknown variants: {', '.join(sorted(unknown))}")
+    return [variant for variant in variants if variant["name"] in names]
@@ -0,0 +1,93 @@
+import importlib
+import sys
+import time
+import traceback
+from pathlib import Path
+
+import pipeline
+from profiling import BuildProfiler
+import variants
+
+# Reloaded in this order, so every module picks up the reloaded modules it imports from
+MODULES = ["cache", "cmap", "gsub", "transform", "gvar", "composite", "variants", "pipeline"]
+# Changes to these modules only affect the stages run for each variant
+VARIANT_MODULES = {"cmap", "gsub", "variants"}
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+class Watcher:
+    def __init__(self, config_path, variant_names=None, jobs=1, use_cache=True, iup_tolerance=0.5, compact=False, interval=1.0):
+        self.config_path = config_path
+        self.variant_names = variant_names
+        self.jobs = jobs
+        self.use_cache = use_cache
+        self.iup_tolerance = iup_tolerance
+        self.compact = compact
+        self.interval = interval
+        self.firacode = None
+        self.pretendard = None
+        self.context = None
+        self.component_ids = None
+
+    def files(self):
+        files = {Path(sys.modules[name].__file__).resolve(): name for name in MODULES}
+        files[Path(self.config_path).resolve()] = None
+        return files
+
+    def load(self, profiler, use_cache):
+        # The hangul stage transforms the glyphs of Pretendard in place, so it always starts from freshly loaded sources.
+        # They replace the current ones only once it succeeded, so a broken edit keeps the last good fonts
+        firacode, pretendard = pipeline.load_sources(profiler)
+        context = pipeline.scaling_context(firacode, pretendard)
+        component_ids = pipeline.insert_hangul(
+            firacode, pretendard, context,
+            self.jobs, use_cache, self.iup_tolerance, self.compact, profiler,
+        )
+        self.firacode, self.pretendard, self.context, self.component_ids = firacode, pretendard, context, component_ids
+
+    def build_variants(self, profiler):
+        selected = variants.select_variants(variants.load_variants(self.config_path, pipeline.FONT_VERSION), self.variant_names)
+        for variant in selected:
+            print(f"Building {variant['family']}")
+            pipeline.build_variant(self.firacode, self.pretendard, self.context, variant, self.component_ids, profiler=profiler)
+        profiler.report(pipeline.BUILD_DIR / "profile.json")
+
+    def rebuild(self, modules):
+        start = time.perf_counter()
+        profiler = BuildProfiler(pipeline.BUILD_DIR)
+        if modules:
+            for name in MODULES:
+                importlib.reload(sys.modules[name])
+        if modules - VARIANT_MODULES:
+            # The glyph cache is keyed by the sources and parameters only, so do not trust it for changed code
+            print("Hangul stages changed, reloading sources")
+            self.load(profiler, use_cache=False)
+        self.build_variants(profiler)
+        print(f"Rebuilt in {time.perf_counter() - start:.2f}s")
+
+    def run(self):
+        # The sources are fetched by the caller
+        profiler = BuildProfiler(pipeline.BUILD_DIR)
+        self.load(profiler, self.use_cache)
+        self.build_variants(profiler)
+
+        mtimes = {path: _mtime(path) for path in self.files()}
+        print("Watching for changes, press Ctrl+C to stop")
+        while True:
+            time.sleep(self.interval)
+            files = self.files()
+            changed = [path for path in files if _mtime(path) != mtimes.get(path)]
+            if not changed:
+                continue
+            for path in changed:
+                print(f"Changed: {path.name}")
+                mtimes[path] = _mtime(path)
+            try:
+                self.rebuild({files[path] for path in changed if files[path] is not None})
+            except Exception:
+                # Keep the sources warm and wait for the next fix
+                traceback.print_exc()
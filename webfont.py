@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from fontTools import subset
+from fontTools.ttLib.ttFont import TTFont
+
+HANGUL_JAMO = range(0x3131, 0x3163)
+HANGUL_SYLLABLES = range(0xAC00, 0xD7A4)
+
+def _is_common_syllable(codepoint):
+    # The 2,350 syllables of KS X 1001 cover nearly all Korean text in practice
+    try:
+        chr(codepoint).encode("euc_kr")
+        return True
+    except UnicodeEncodeError:
+        return False
+
+def syllables_by_frequency():
+    common = [codepoint for codepoint in HANGUL_SYLLABLES if _is_common_syllable(codepoint)]
+    rare = [codepoint for codepoint in HANGUL_SYLLABLES if not _is_common_syllable(codepoint)]
+    return common + rare
+
+def unicode_ranges(codepoints):
+    ranges = []
+    for codepoint in sorted(codepoints):
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    return ", ".join(f"U+{start:X}" if start == end else f"U+{start:X}-{end:X}" for start, end in ranges)
+
+def _build_shard(args):
+    path, shard_path, codepoints = args
+    options = subset.Options()
+    # Keep every feature so the Fira Code ligatures and the patched calt lookups survive
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.notdef_outline = True
+    # HVAR is carried over from Fira Code and has no entries for the inserted hangul glyphs,
+    # renderers fall back to the gvar phantom points without it
+    options.drop_tables += ["HVAR"]
+    options.flavor = "woff2"
+    font = TTFont(path)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = "woff2"
+    font.save(shard_path)
+    return shard_path
+
+def build_shards(path, output_dir, family, shard_size=1000, jobs=1):
+    font = TTFont(path)
+    codepoints = set(font.getBestCmap())
+    hangul = set(HANGUL_JAMO) | set(HANGUL_SYLLABLES)
+    syllables = [codepoint for codepoint in syllables_by_frequency() if codepoint in codepoints]
+    shards = [
+        ("latin", sorted(codepoints - hangul)),
+        ("jamo", [codepoint for codepoint in HANGUL_JAMO if codepoint in codepoints]),
+    ]
+    for i in range(0, len(syllables), shard_size):
+        shards.append((f"hangul{i // shard_size}", syllables[i:i + shard_size]))
+    shards = [(name, shard) for name, shard in shards if shard]
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = path.stem
+    args = [(path, output_dir / f"{stem}.{name}.woff2", shard) for name, shard in shards]
+    with ProcessPoolExecutor(max(1, jobs)) as executor:
+        shard_paths = list(executor.map(_build_shard, args))
+
+    weight = next((axis for axis in font["fvar"].axes if axis.axisTag == "wght"), None) if "fvar" in font else None
+    font_weight = f"{weight.minValue:g} {weight.maxValue:g}" if weight is not None else "normal"
+    css = []
+    for shard_path, (_, shard) in zip(shard_paths, shards):
+        css.append(
+            "@font-face {\n"
+            f"  font-family: \"{family}\";\n"
+            f"  src: url(\"{shard_path.name}\") format(\"woff2\");\n"
+            f"  font-weight: {font_weight};\n"
+            "  font-display: swap;\n"
+            f"  unicode-range: {unicode_ranges(shard)};\n"
+            "}\n"
+        )
+    css_path = output_dir / f"{stem}.css"
+    css_path.write_text("\n".join(css))
+    return shard_paths + [css_path]